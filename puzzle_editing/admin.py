@@ -75,6 +75,16 @@ class TestsolveSessionAdmin(admin.ModelAdmin):
 class TestsolveParticipationAdmin(ImportExportModelAdmin):
     model = TestsolveParticipation
 
+    # __str__ shows the username
+    list_select_related = ("user",)
+
+
+class TestsolveGuessAdmin(admin.ModelAdmin):
+    model = TestsolveGuess
+
+    # __str__ shows the username
+    list_select_related = ("user",)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Round)
@@ -89,7 +99,7 @@ admin.site.register(StatusSubscription)
 admin.site.register(TestsolveSession, TestsolveSessionAdmin)
 admin.site.register(PuzzleComment)
 admin.site.register(TestsolveParticipation, TestsolveParticipationAdmin)
-admin.site.register(TestsolveGuess)
+admin.site.register(TestsolveGuess, TestsolveGuessAdmin)
 admin.site.register(Hint)
 admin.site.register(CommentReaction)
 admin.site.register(SiteSetting)
@@ -1,5 +1,8 @@
 import logging
 import re
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
 from typing import Any
 from urllib.parse import urlencode
 
@@ -16,10 +19,56 @@ JsonDict = dict[str, Any]
 MsgPayload = str | JsonDict
 
 
+# Each thread keeps its own requests.Session (Sessions aren't thread-safe, and
+# a Client may be shared between threads) so that requests reuse pooled
+# keep-alive connections instead of opening a new TLS connection to discord
+# each time. get_client builds a fresh Client per call, so a per-instance
+# session wouldn't help.
+_local = threading.local()
+
+
+def _get_session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        # Don't carry cookies (e.g. Cloudflare's) over between requests
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        _local.session = session
+    return session
+
+
 class DiscordError(Exception):
     """Generic discord integration failure."""
 
 
+# Path segments whose following id is part of the rate limit bucket
+_MAJOR_PARAMETERS = frozenset(("channels", "guilds", "webhooks"))
+
+
+def _route_key(method: str, endpoint: str) -> str:
+    """Approximate the rate limit bucket a request falls into.
+
+    Discord rate limits per route, where a route is the endpoint template plus
+    its "major" parameter (a channel, guild or webhook id). Other ids in the
+    path are treated as part of the template.
+
+    >>> _route_key("get", "/channels/123/messages/456?limit=1")
+    'get /channels/123/messages/{id}'
+    >>> _route_key("patch", "/guilds/789/channels")
+    'patch /guilds/789/channels'
+    """
+    segments = endpoint.split("?", 1)[0].split("/")
+    for i in range(1, len(segments)):
+        if segments[i].isdigit() and segments[i - 1] not in _MAJOR_PARAMETERS:
+            segments[i] = "{id}"
+    return f"{method} {'/'.join(segments)}"
+
+
+_WHITESPACE_RE = re.compile(r"\s")
+_CHANNEL_NAME_STRIP_RE = re.compile(r"[#!,()'\":?<>{}|[\]@$%^&*=+/\\;.]")
+_HYPHENS_RE = re.compile(r"-+")
+
+
 def sanitize_channel_name(name: str) -> str:
     """A rough approximation of discord channel sanitization.
 
@@ -41,9 +90,9 @@ def sanitize_channel_name(name: str) -> str:
     '-foo-bar-'
     """
     name = name.lower().strip()
-    name = re.sub(r"\s", "-", name)
-    name = re.sub(r"[#!,()'\":?<>{}|[\]@$%^&*=+/\\;.]", "", name)
-    name = re.sub(r"-+", "-", name)
+    name = _WHITESPACE_RE.sub("-", name)
+    name = _CHANNEL_NAME_STRIP_RE.sub("", name)
+    name = _HYPHENS_RE.sub("-", name)
     return name
 
 
@@ -58,10 +107,23 @@ class Client:
         self,
         token: str,
         guild_id: str,
+        rate_limit_retries: int = 0,
     ):
-        """Initialise the Discord client object"""
+        """Initialise the Discord client object
+
+        If rate_limit_retries is non-zero, the client becomes rate limit aware:
+        once discord reports that a route's bucket is exhausted, further
+        requests on that route wait for it to reset, and requests that are
+        rate limited anyway are retried (after waiting as long as discord asks)
+        up to that many times before giving up. The client can then be shared
+        between threads.
+        """
         self._token = token
         self.guild_id = guild_id
+        self.rate_limit_retries = rate_limit_retries
+        # Monotonic time at which each exhausted route resets
+        self._route_resets: dict[str, float] = {}
+        self._route_resets_lock = threading.Lock()
 
     def _raw_request(
         self, method: str, endpoint: str, json: Any = None
@@ -73,18 +135,70 @@ class Client:
         }
         api_url = f"{self._api_base_url}{endpoint}"
         if method in ["get", "delete"]:
-            return requests.request(method, api_url, headers=headers)
+            return _get_session().request(method, api_url, headers=headers)
         elif method in ["patch", "post", "put"]:
             headers["Content-Type"] = "application/json"
-            return requests.request(method, api_url, headers=headers, json=json)
+            return _get_session().request(method, api_url, headers=headers, json=json)
         msg = f"Unknown method {method}"
         raise ValueError(msg)
 
+    def _wait_for_route(self, route: str) -> None:
+        with self._route_resets_lock:
+            reset = self._route_resets.pop(route, None)
+        if reset is not None:
+            delay = reset - time.monotonic()
+            if delay > 0:
+                logger.debug("Waiting %.2fs for %s to reset", delay, route)
+                time.sleep(delay)
+
+    def _record_route_limit(self, route: str, resp: requests.Response) -> None:
+        if resp.headers.get("X-RateLimit-Remaining") != "0":
+            return
+        reset_after = resp.headers.get("X-RateLimit-Reset-After")
+        if reset_after is None:
+            return
+        with self._route_resets_lock:
+            self._route_resets[route] = time.monotonic() + float(reset_after)
+
+    @staticmethod
+    def _retry_after(resp: requests.Response) -> float:
+        """How long discord wants us to wait before retrying, in seconds."""
+        if retry_after := resp.headers.get("Retry-After"):
+            return float(retry_after)
+        try:
+            return float(resp.json().get("retry_after", 1))
+        except ValueError:
+            # e.g. an HTML error page from Cloudflare
+            return 1.0
+
     def _request(self, method: str, endpoint: str, json: Any = None) -> Any:
-        resp = self._raw_request(method, endpoint, json)
+        route = _route_key(method, endpoint)
+        rate_limit_aware = self.rate_limit_retries > 0
+        retries = 0
+        while True:
+            if rate_limit_aware:
+                self._wait_for_route(route)
+            resp = self._raw_request(method, endpoint, json)
+            if rate_limit_aware:
+                self._record_route_limit(route, resp)
+            if resp.status_code != 429 or retries >= self.rate_limit_retries:
+                break
+            retry_after = self._retry_after(resp)
+            logger.info(
+                "Discord rate limited %s %s, retrying in %ss",
+                method,
+                endpoint,
+                retry_after,
+            )
+            time.sleep(retry_after)
+            retries += 1
         if resp.status_code == 204:  # No Content
             return {}
-        content = resp.json()
+        try:
+            content = resp.json()
+        except ValueError:
+            resp.raise_for_status()
+            raise
         if resp.status_code >= 400:
             logger.error(
                 "Discord request returned error code %s: %s",
@@ -109,6 +223,11 @@ class Client:
         pth = f"/channels/{channel}"
         return self._request("patch", pth, updates)
 
+    def bulk_set_channel_positions(self, positions: list[tuple[str, int]]) -> None:
+        """Move many channels in the guild with a single request."""
+        pth = f"/guilds/{self.guild_id}/channels"
+        self._request("patch", pth, [{"id": i, "position": p} for i, p in positions])
+
     def create_category(self, name: str) -> JsonDict:
         """Creates a new category channel in the guild."""
         json = {"name": name, "type": 4}
@@ -102,8 +102,11 @@ class PermissionOverwrite:
         }
 
 
-def get_client() -> Client | None:
-    """Gets a discord client, or None if discord isn't enabled."""
+def get_client(rate_limit_retries: int = 0) -> Client | None:
+    """Gets a discord client, or None if discord isn't enabled.
+
+    See Client for the meaning of rate_limit_retries.
+    """
     discord_bot_token = settings.DISCORD_BOT_TOKEN
     discord_guild_id = settings.DISCORD_GUILD_ID
     if discord_bot_token is None or discord_guild_id is None:
@@ -111,6 +114,7 @@ def get_client() -> Client | None:
     return Client(
         discord_bot_token,
         discord_guild_id,
+        rate_limit_retries=rate_limit_retries,
     )
 
 
@@ -1,6 +1,10 @@
+import argparse
 import datetime
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
+from django import db
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils import timezone
@@ -10,6 +14,14 @@ from puzzle_editing import status
 from puzzle_editing.models import DiscordCategoryCache, DiscordTextChannelCache, Puzzle
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        msg = f"must be at least 1, got {number}"
+        raise argparse.ArgumentTypeError(msg)
+    return number
+
+
 class Command(BaseCommand):
     help = """Clean up discord status channels."""
 
@@ -17,6 +29,7 @@ class Command(BaseCommand):
         super().__init__(*a, **kw)
         self.logger = logging.getLogger("puzzle_editing.commands")
         self.dry_run = True
+        self.cached_channel_ids: frozenset[str] = frozenset()
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -41,84 +54,132 @@ class Command(BaseCommand):
         parser.add_argument(
             "--all", action="store_true", help="Shorthand for setting all the modes"
         )
+        parser.add_argument(
+            "--workers",
+            type=positive_int,
+            default=8,
+            help=(
+                "Number of concurrent workers making Discord requests (puzzle "
+                "statuses are processed in parallel, as are category deletions)"
+            ),
+        )
+        parser.add_argument(
+            "--rate-limit-retries",
+            type=int,
+            default=5,
+            help="How many times to retry a request that Discord rate limits",
+        )
 
-    def organize_puzzles(self, client: discord.Client) -> None:
+    def organize_puzzles(self, client: discord.Client, workers: int) -> None:
         """Fix up puzzle channels in discord.
 
         If sync is True, fix each puzzle channel's name and permissions, and
         move each puzzle channel to the correct category.
+
+        Puzzles are bucketed by status and the buckets are processed
+        concurrently. Puzzles within a bucket are processed one at a time,
+        since they all compete for the same status categories (which may need
+        to be created or may fill up).
         """
-        puzzles = Puzzle.objects.all()
+        # Dead and deferred puzzles never get a new channel, so there's nothing
+        # to do for them unless they already have one. sync_puzzle_channel
+        # checks all of these relations for every other puzzle.
+        puzzles = Puzzle.objects.exclude(
+            discord_channel_id="", status__in=[status.DEAD, status.DEFERRED]
+        ).prefetch_related(
+            "authors", "editors", "postprodders", "factcheckers", "spoiled"
+        )
         self.logger.info(f"Organizing {len(puzzles)} puzzles...")
+        # Load the known channel ids once rather than checking each puzzle's
+        # channel with its own query
+        self.cached_channel_ids = frozenset(
+            DiscordTextChannelCache.objects.values_list("id", flat=True)
+        )
+        by_status: defaultdict[str, list[Puzzle]] = defaultdict(list)
         for p in puzzles:
-            if p.discord_channel_id and p.status == status.DEAD:
-                status_change_comment = (
-                    p.comments.filter(status_change=status.DEAD)
-                    .order_by("-date")
-                    .first()
-                )
-                if (
-                    status_change_comment
-                    and status_change_comment.date
-                    < timezone.now() - datetime.timedelta(days=7)
-                ):
-                    if self.dry_run:
-                        self.logger.info(
-                            f"Would delete channel for dead puzzle {p.name}"
-                        )
-                    else:
-                        client.delete_channel(p.discord_channel_id)
-                        p.discord_channel_id = ""
-                        p.discord_info_message_id = ""
-                        p.save()
-                    continue
+            by_status[p.status].append(p)
 
-            if (
-                p.discord_channel_id
-                and len(set(p.authors.all()) | set(p.editors.all())) <= 1
-            ):
-                # If there have been no non-bot messages, then we can delete the channel
-                messages = client.get_channel_messages(p.discord_channel_id)
-                if all(
-                    m["author"]["id"] == settings.DISCORD_CLIENT_ID for m in messages
-                ):
-                    if self.dry_run:
-                        self.logger.info(
-                            f"Would delete channel for single-author puzzle {p.name}"
-                        )
-                    else:
-                        client.delete_channel(p.discord_channel_id)
-                        p.discord_channel_id = ""
-                        p.discord_info_message_id = ""
-                        p.save()
-                    continue
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(self.organize_puzzle_group, client, group)
+                for group in by_status.values()
+            ]
+        for future in futures:
+            # Re-raise any exception from the worker threads
+            future.result()
 
+    def organize_puzzle_group(
+        self, client: discord.Client, puzzles: list[Puzzle]
+    ) -> None:
+        try:
+            for p in puzzles:
+                self.organize_puzzle(client, p)
+        finally:
+            # Each worker thread gets its own database connection
+            db.connection.close()
+
+    def organize_puzzle(self, client: discord.Client, p: Puzzle) -> None:
+        if p.discord_channel_id and p.status == status.DEAD:
+            status_change_comment = (
+                p.comments.filter(status_change=status.DEAD).order_by("-date").first()
+            )
             if (
-                p.discord_channel_id
-                and not DiscordTextChannelCache.objects.filter(
-                    id=p.discord_channel_id
-                ).exists()
+                status_change_comment
+                and status_change_comment.date
+                < timezone.now() - datetime.timedelta(days=7)
             ):
-                # channel id is empty OR points to an id that doesn't exist
-                self.logger.warning(
-                    (
-                        f"Puzzle {p.id} ({p.name}) has bad channel id"
-                        f" ({p.discord_channel_id})"
-                    ),
-                )
                 if self.dry_run:
-                    self.logger.warning("Refusing to fix in dryrun mode.")
+                    self.logger.info(f"Would delete channel for dead puzzle {p.name}")
                 else:
+                    client.delete_channel(p.discord_channel_id)
                     p.discord_channel_id = ""
                     p.discord_info_message_id = ""
                     p.save()
-                continue
+                return
 
-            if not self.dry_run:
-                discord.sync_puzzle_channel(client, p)
+        if (
+            p.discord_channel_id
+            and len(set(p.authors.all()) | set(p.editors.all())) <= 1
+        ):
+            # If there have been no non-bot messages, then we can delete the channel
+            messages = client.get_channel_messages(p.discord_channel_id)
+            if all(m["author"]["id"] == settings.DISCORD_CLIENT_ID for m in messages):
+                if self.dry_run:
+                    self.logger.info(
+                        f"Would delete channel for single-author puzzle {p.name}"
+                    )
+                else:
+                    client.delete_channel(p.discord_channel_id)
+                    p.discord_channel_id = ""
+                    p.discord_info_message_id = ""
+                    p.save()
+                return
+
+        if p.discord_channel_id and p.discord_channel_id not in self.cached_channel_ids:
+            # channel id is empty OR points to an id that doesn't exist
+            self.logger.warning(
+                (
+                    f"Puzzle {p.id} ({p.name}) has bad channel id"
+                    f" ({p.discord_channel_id})"
+                ),
+            )
+            if self.dry_run:
+                self.logger.warning("Refusing to fix in dryrun mode.")
+            else:
+                p.discord_channel_id = ""
+                p.discord_info_message_id = ""
+                p.save()
+            return
+
+        if not self.dry_run:
+            discord.sync_puzzle_channel(client, p)
 
     def organize_categories(
-        self, client: discord.Client, delete_empty: bool, sort_cats: bool
+        self,
+        client: discord.Client,
+        delete_empty: bool,
+        sort_cats: bool,
+        workers: int,
     ) -> None:
         """Organize the status categories.
 
@@ -141,41 +202,41 @@ class Command(BaseCommand):
         # than the possible number of channels
         starting_position = 1000
         if sort_cats:
+            # Lightweight named tuples are all we need, not model instances
             new_order = sorted(
-                DiscordCategoryCache.objects.exclude(puzzle_status="").all(),
+                DiscordCategoryCache.objects.exclude(puzzle_status="").values_list(
+                    "id", "name", "puzzle_status", "puzzle_status_index", named=True
+                ),
                 key=lambda c: (
                     status.get_status_rank(c.puzzle_status),
                     c.puzzle_status_index,
                 ),
             )
-            new_order_request = []
-            for i, cat in enumerate(new_order):
-                if self.dry_run:
+            new_positions = [
+                (cat.id, starting_position + i) for i, cat in enumerate(new_order)
+            ]
+            if self.dry_run:
+                for i, cat in enumerate(new_order):
                     self.logger.info(
                         f"Would move category {cat.name} to position {starting_position + i}"
                     )
-                new_order_request.append(
-                    {
-                        "id": cat.id,
-                        "position": starting_position + i,
-                    }
-                )
-            if not self.dry_run:
-                client._request(
-                    "patch",
-                    f"/guilds/{client.guild_id}/channels",
-                    json=new_order_request,
-                )
+            else:
+                client.bulk_set_channel_positions(new_positions)
 
         # Delete any status categories with no channels in them
         if delete_empty:
-            for cat in DiscordCategoryCache.objects.filter(
-                text_channels__isnull=True
-            ).exclude(puzzle_status=""):
-                if self.dry_run:
+            empty_cats = (
+                DiscordCategoryCache.objects.filter(text_channels__isnull=True)
+                .exclude(puzzle_status="")
+                .values_list("id", "name", named=True)
+            )
+            if self.dry_run:
+                for cat in empty_cats:
                     self.logger.info(f"Would delete category {cat.name}")
-                else:
-                    client.delete_channel(cat.id)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    # list() so that any exceptions are re-raised here
+                    list(pool.map(client.delete_channel, (c.id for c in empty_cats)))
 
     def handle(self, *args, **options) -> None:
         delete_cats = options["delete_cats"] or options["all"]
@@ -190,12 +251,15 @@ class Command(BaseCommand):
             3: logging.DEBUG,
         }
         self.logger.setLevel(levels.get(vb, logging.DEBUG))
-        client = discord.get_client()
+        workers = options["workers"]
+        # With several workers we're likely to bump into rate limits, so wait
+        # them out rather than failing
+        client = discord.get_client(rate_limit_retries=options["rate_limit_retries"])
         if not client:
             self.logger.error("No discord client found. Exiting.")
             return
         # Clean up each puzzle
-        self.organize_puzzles(client)
+        self.organize_puzzles(client, workers)
         # Process categories
         if delete_cats or sort_cats:
-            self.organize_categories(client, delete_cats, sort_cats)
+            self.organize_categories(client, delete_cats, sort_cats, workers)
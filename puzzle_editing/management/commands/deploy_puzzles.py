@@ -1,5 +1,7 @@
 import json
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import git
@@ -10,42 +12,103 @@ from django.core.management.base import BaseCommand, CommandError
 from puzzle_editing.models import PuzzlePostprod
 
 
+def repo_status(repo: git.Repo) -> tuple[bool, list[str]]:
+    """Check for changes to tracked files and list untracked files.
+
+    This is equivalent to repo.is_dirty() and repo.untracked_files, but only
+    walks the worktree once.
+    """
+    dirty = False
+    untracked_files = []
+    entries = iter(
+        repo.git.status("--porcelain=v2", "-z", "--untracked-files=all").split("\0")
+    )
+    for entry in entries:
+        if entry.startswith("? "):
+            untracked_files.append(entry[2:])
+        elif entry.startswith(("1 ", "u ")):
+            dirty = True
+        elif entry.startswith("2 "):
+            dirty = True
+            # Renames and copies are followed by the original path
+            next(entries, None)
+    return dirty, untracked_files
+
+
+def remove_path(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def deploy_puzzle(puzzlePath: Path, metadata: dict) -> None:
+    """Bring a puzzle's folder up to date, leaving it alone if it's unchanged."""
+    puzzlePath.mkdir(parents=True, exist_ok=True)
+    # zipFile = pp.zip_file
+    # with ZipFile(zipFile) as zf:
+    #    zf.extractall(puzzlePath)
+    metadataPath = puzzlePath / "metadata.json"
+    for child in puzzlePath.iterdir():
+        if child != metadataPath:
+            remove_path(child)
+    content = json.dumps(metadata)
+    if metadataPath.exists() and metadataPath.read_text() == content:
+        return
+    metadataPath.write_text(content)
+
+
 class Command(BaseCommand):
     help = """Sync puzzles into Hunt Repository."""
 
     def handle(self, *args, **options):
-        if not Path(settings.HUNT_REPO).exists() and settings.HUNT_REPO:
+        huntRepo = settings.HUNT_REPO
+        if not huntRepo:
+            msg = "HUNT_REPO is not set"
+            raise CommandError(msg)
+        if not huntRepo.exists():
             management.call_command("setup_git")
 
-        repo = git.Repo.init(settings.HUNT_REPO)
+        repo = git.Repo.init(huntRepo)
+        dirty, untracked_files = repo_status(repo)
         if (
-            repo.is_dirty()
-            or len(repo.untracked_files) > 0
+            dirty
+            or len(untracked_files) > 0
             or repo.head.reference.name not in ["master", "main"]
         ):
-            msg = f"Repository is in a broken state. [{repo.is_dirty()} / {repo.untracked_files} / {repo.head.reference.name}]"
+            msg = f"Repository is in a broken state. [{dirty} / {untracked_files} / {repo.head.reference.name}]"
             raise CommandError(msg)
 
         origin = repo.remotes.origin
         origin.pull()
 
-        puzzleFolder = Path(settings.HUNT_REPO) / "hunt/data/puzzle"
+        puzzleFolder = huntRepo / "hunt/data/puzzle"
+
+        puzzleFolder.mkdir(parents=True, exist_ok=True)
+
+        # Build the metadata up front so worker threads never touch the DB
+        postprods = PuzzlePostprod.objects.select_related("puzzle").prefetch_related(
+            "puzzle__authors",
+            "puzzle__editors",
+            "puzzle__answers",
+            "puzzle__other_credits__users",
+        )
+        deploys = [(puzzleFolder / pp.slug, pp.puzzle.metadata) for pp in postprods]
 
-        shutil.rmtree(puzzleFolder)
-        Path(puzzleFolder).mkdir(parents=True, exist_ok=True)
+        # Update the existing folders in place rather than recreating them all,
+        # so unchanged puzzles cost nothing (for us or for git)
+        slugs = {puzzlePath.name for puzzlePath, _ in deploys}
+        for child in puzzleFolder.iterdir():
+            if child.name not in slugs:
+                remove_path(child)
 
-        for pp in PuzzlePostprod.objects.all():
-            metadata = pp.puzzle.metadata
-            puzzlePath = Path(puzzleFolder) / pp.slug
-            puzzlePath.mkdir(parents=True, exist_ok=True)
-            # zipFile = pp.zip_file
-            # with ZipFile(zipFile) as zf:
-            #    zf.extractall(puzzlePath)
-            with (Path(puzzlePath) / "metadata.json").open("w") as mf:
-                json.dump(metadata, mf)
-            repo.git.add(puzzlePath)
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            futures = [pool.submit(deploy_puzzle, *deploy) for deploy in deploys]
+            for future in futures:
+                future.result()
 
-        if repo.is_dirty() or len(repo.untracked_files) > 0:
+        dirty, untracked_files = repo_status(repo)
+        if dirty or len(untracked_files) > 0:
             repo.git.add(update=True)
             repo.git.add(A=True)
             repo.git.commit("-m", "Postprodding all puzzles.")
@@ -4,7 +4,16 @@ from django.core.management.base import BaseCommand
 
 from puzzle_editing import discord_daemon
 
+try:
+    # uvloop is a faster drop-in event loop, but it's optional (and POSIX-only)
+    import uvloop  # type: ignore
+
+    loop_factory = uvloop.new_event_loop
+except ImportError:
+    loop_factory = None
+
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        asyncio.run(discord_daemon.asyncio_main())
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(discord_daemon.asyncio_main())
@@ -33,7 +33,4 @@ class Command(BaseCommand):
             for t, label in transitions:
                 edges.append(f'  {status_name} -> {t} [label="{label}"];')
 
-        print("digraph {")
-        print("\n".join(nodes))
-        print("\n".join(edges))
-        print("}")
+        print("\n".join(["digraph {", *nodes, *edges, "}"]))
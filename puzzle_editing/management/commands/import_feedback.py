@@ -1,7 +1,8 @@
 import json
 from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from puzzle_editing.models import Puzzle, PuzzleComment, User
 
@@ -14,21 +15,32 @@ class Command(BaseCommand):
         parser.add_argument("user", type=str)
 
     def handle(self, *args, **options):
-        print(options)
         user = User.objects.get(username=options["user"])
         with Path(options["filename"]).open() as f:
             data = json.load(f)
 
+        # Ids may come through as strings; in_bulk keys by the integer pk
+        puzzle_ids = {int(line[0]) for line in data}
+        puzzles = Puzzle.objects.in_bulk(puzzle_ids)
+        if missing := puzzle_ids - puzzles.keys():
+            msg = f"Unknown puzzle ids: {', '.join(map(str, sorted(missing)))}"
+            raise CommandError(msg)
+
+        comments = []
         for line in data:
             puzzleid, comment, fun, diff = line
             content = (
-                f"Feedback from BTS:\n\n{comment}\n\n"
-                f"Fun: {fun} / Difficulty: {diff}"
+                f"Feedback from BTS:\n\n{comment}\n\nFun: {fun} / Difficulty: {diff}"
             )
-            comment = PuzzleComment.objects.create(
-                puzzle=Puzzle.objects.get(id=puzzleid),
-                author=user,
-                is_system=True,
-                content=content,
+            comments.append(
+                PuzzleComment(
+                    puzzle=puzzles[int(puzzleid)],
+                    author=user,
+                    is_system=True,
+                    is_feedback=True,
+                    content=content,
+                )
             )
-            comment.save()
+
+        with transaction.atomic():
+            PuzzleComment.objects.bulk_create(comments, batch_size=500)
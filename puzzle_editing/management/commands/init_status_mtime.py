@@ -1,6 +1,7 @@
 import time
 
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 
 from puzzle_editing import status
 from puzzle_editing.models import Puzzle, PuzzleComment
@@ -25,11 +26,19 @@ class Command(BaseCommand):
     help = """Fix up the status mtime field."""
 
     def handle(self, *args, **options):
-        comments = PuzzleComment.objects.filter(is_system=True).order_by("date")
+        comments = (
+            PuzzleComment.objects.filter(is_system=True)
+            .filter(
+                Q(content="Created puzzle")
+                | Q(content__startswith="Status changed to ")
+            )
+            .order_by("date")
+            .values_list("puzzle_id", "content", "date")
+        )
         last_updates = {}
-        for comment in comments:
-            if parse_comment(comment.content):
-                last_updates[comment.puzzle.pk] = comment.date
+        for puzzle_id, content, date in comments.iterator():
+            if parse_comment(content):
+                last_updates[puzzle_id] = date
 
         for pk, mtime in last_updates.items():
             time.sleep(0.1)  # this avoids strange database overload issues
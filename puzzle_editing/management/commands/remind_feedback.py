@@ -1,7 +1,9 @@
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
 
 from puzzle_editing import messaging
-from puzzle_editing.models import TestsolveParticipation, User
+from puzzle_editing.models import Puzzle, TestsolveParticipation
 
 
 class Command(BaseCommand):
@@ -27,17 +29,25 @@ class Command(BaseCommand):
                 .all()
             }
         )
-        testsolve_participations_in_ended = TestsolveParticipation.objects.filter(
-            ended__isnull=True
-        ).filter(session__in=testsolve_sessions_ended)
+        testsolve_participations_in_ended = (
+            TestsolveParticipation.objects.filter(ended__isnull=True)
+            .filter(session__in=testsolve_sessions_ended)
+            .select_related("user", "session__puzzle")
+        )
 
-        user_reminds = {}
+        users = {}
+        user_reminds = defaultdict(list)
 
         for tp in testsolve_participations_in_ended:
-            try:
-                user_reminds[tp.user_id].append(tp)
-            except KeyError:
-                user_reminds[tp.user_id] = [tp]
+            users[tp.user_id] = tp.user
+            user_reminds[tp.user_id].append(tp)
+
+        # Look up everyone's spoiled puzzles at once rather than per user
+        spoiled_puzzles = defaultdict(set)
+        for user_id, puzzle_id in Puzzle.spoiled.through.objects.filter(
+            user_id__in=user_reminds.keys()
+        ).values_list("user_id", "puzzle_id"):
+            spoiled_puzzles[user_id].add(puzzle_id)
 
         if options["dry_run"]:
             print(
@@ -48,11 +58,11 @@ class Command(BaseCommand):
         reminded_count = 0
 
         for t_user_id, t_sessions in user_reminds.items():
-            t_user = User.objects.get(id=t_user_id)
-            t_spoiled = [sp.id for sp in t_user.spoiled_puzzles.all()]
+            t_user = users[t_user_id]
+            t_spoiled = spoiled_puzzles[t_user_id]
 
             missing_feedback = [
-                ts for ts in t_sessions if ts.session.puzzle.id not in t_spoiled
+                ts for ts in t_sessions if ts.session.puzzle_id not in t_spoiled
             ]
 
             if options["dry_run"]:
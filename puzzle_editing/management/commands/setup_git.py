@@ -35,9 +35,6 @@ class Command(BaseCommand):
                 config.write("  UserKnownHostsFile /dev/null\n")
                 config.write("  LogLevel ERROR\n")
 
-        os.system('git config --global user.name "Puzzup"')
-        os.system(f'git config --global user.email "{settings.AUTOPOSTPROD_EMAIL}"')
-
         git_ssh_id_file = settings.SSH_KEY.expanduser()
         git_ssh_cmd = f"ssh -i {git_ssh_id_file}"
 
@@ -47,3 +44,8 @@ class Command(BaseCommand):
             env={"GIT_SSH_COMMAND": git_ssh_cmd},
         )
         repo.remotes.origin.set_url(settings.HUNT_REPO_URL)
+
+        # Write the global config directly, rather than shelling out to git
+        with repo.config_writer(config_level="global") as config:
+            config.set_value("user", "name", "Puzzup")
+            config.set_value("user", "email", settings.AUTOPOSTPROD_EMAIL)
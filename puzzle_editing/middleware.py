@@ -1,17 +1,60 @@
 # Based off the documentation at https://docs.djangoproject.com/en/4.0/topics/i18n/timezones/#selecting-the-current-time-zone
+import functools
 import zoneinfo
 
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
 from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
 
 
+@functools.lru_cache(maxsize=512)
+def get_zoneinfo(tzname: str) -> zoneinfo.ZoneInfo:
+    # ZoneInfo only keeps a handful of zones strongly cached, and users can be
+    # spread across more than that
+    return zoneinfo.ZoneInfo(tzname)
+
+
+def set_user_timezone(user) -> None:
+    tzname = user.timezone if user is not None and user.is_authenticated else None
+    if tzname:
+        timezone.activate(get_zoneinfo(tzname))
+    else:
+        timezone.deactivate()
+
+
+# This supports async so that under daphne it doesn't force a hop into a worker
+# thread (and back out to the event loop) just to look up the user's timezone.
+@sync_and_async_middleware
 def timezone_middleware(get_response):
-    def middleware(request):
-        tzname = request.user.timezone if request.user.is_authenticated else None
-        if tzname:
-            timezone.activate(zoneinfo.ZoneInfo(tzname))
-        else:
-            timezone.deactivate()
-        return get_response(request)
+    # Without a session cookie there's no logged in user, so don't bother
+    # resolving request.user (e.g. for Discord interaction webhooks)
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                set_user_timezone(await request.auser())
+            else:
+                set_user_timezone(None)
+            try:
+                return await get_response(request)
+            finally:
+                # Don't leak this user's timezone into whatever runs next
+                timezone.deactivate()
+
+    else:
+
+        def middleware(request):
+            if settings.SESSION_COOKIE_NAME in request.COOKIES:
+                set_user_timezone(request.user)
+            else:
+                set_user_timezone(None)
+            try:
+                return get_response(request)
+            finally:
+                # Don't leak this user's timezone into whatever the thread does
+                # next
+                timezone.deactivate()
 
     return middleware
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0034_add_fab_credit_type"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="puzzle",
+            name="discord_channel_id",
+            field=models.CharField(blank=True, db_index=True, max_length=19),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0035_index_puzzle_discord_channel_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="puzzle",
+            index=models.Index(fields=["status"], name="puzzle_edit_status_998ea1_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="puzzlecomment",
+            index=models.Index(
+                fields=["puzzle", "-date"], name="puzzle_edit_puzzle__29af54_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="puzzlevisited",
+            index=models.Index(
+                fields=["puzzle", "user"], name="puzzle_edit_puzzle__778e6c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="testsolveparticipation",
+            index=models.Index(
+                fields=["session", "user"], name="puzzle_edit_session_4a496b_idx"
+            ),
+        ),
+    ]
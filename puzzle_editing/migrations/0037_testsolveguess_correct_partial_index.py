@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0036_add_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="testsolveguess",
+            index=models.Index(
+                condition=models.Q(("correct", True)),
+                fields=["session"],
+                name="puzzle_edit_guess_correct_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0037_testsolveguess_correct_partial_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="puzzle",
+            name="status_mtime",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_visits(apps, schema_editor):
+    PuzzleVisited = apps.get_model("puzzle_editing", "PuzzleVisited")
+    duplicates = (
+        PuzzleVisited.objects.values("puzzle", "user")
+        .annotate(count=Count("id"), latest=Max("date"))
+        .filter(count__gt=1)
+    )
+    for dup in duplicates:
+        visits = PuzzleVisited.objects.filter(puzzle=dup["puzzle"], user=dup["user"])
+        keep = visits.filter(date=dup["latest"]).values_list("id", flat=True)[0]
+        visits.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0038_puzzle_status_mtime_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_visits, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="puzzlevisited",
+            name="puzzle_edit_puzzle__778e6c_idx",
+        ),
+        migrations.AlterUniqueTogether(
+            name="puzzlevisited",
+            unique_together={("puzzle", "user")},
+        ),
+    ]
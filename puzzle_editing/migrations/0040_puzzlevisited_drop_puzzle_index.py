@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-16 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("puzzle_editing", "0039_unique_puzzle_visit"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="puzzlevisited",
+            name="puzzle",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="puzzle_editing.puzzle",
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 import datetime
+import functools
 import logging
 import random
 import re
@@ -21,7 +22,8 @@ from django.db import models
 from django.db.models.signals import m2m_changed, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from django.utils.html import format_html, format_html_join
+from django.utils.functional import cached_property
+from django.utils.html import conditional_escape, format_html, format_html_join
 from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
@@ -33,6 +35,20 @@ from puzzle_editing import messaging, status
 
 logger = logging.getLogger(__name__)
 
+_SLUG_SEPARATOR_RE = re.compile(r"[ \/]+")
+_SLUG_STRIP_RE = re.compile(r'[<>#%\'"|{}\[\])(\\\^?=`;@&,]')
+
+# Fixtures only contain plain data, so use libyaml's safe emitter when PyYAML
+# was built with it
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def _join_names(names: list[str], oxford_comma: bool = False) -> str:
+    """Joins names as "A, B and C" (or "A, B, and C")."""
+    if len(names) <= 2:
+        return " and ".join(names)
+    return f"{", ".join(names[:-1])}{"," if oxford_comma else ""} and {names[-1]}"
+
 
 class PuzzupUserManager(UserManager):
     def get_queryset(self, *args, **kwargs):
@@ -53,6 +69,13 @@ class CustomUsernameValidator(UnicodeUsernameValidator):
     )
 
 
+@functools.lru_cache(maxsize=4096)
+def _user_url(username: str) -> str:
+    # The user URL only depends on the username, and user lists render it in
+    # inner loops, so skip the resolver walk for users we've already seen.
+    return urls.reverse("user", args=[username])
+
+
 class User(AbstractUser):
     class Meta:
         # make Django always use the objects manager (so that we prefetch)
@@ -116,21 +139,26 @@ class User(AbstractUser):
             self.discord_user_id = None
         super().save(*args, **kwargs)
 
+    @cached_property
+    def group_names(self) -> frozenset[str]:
+        # Invalidated by clear_group_names when this user's groups change
+        return frozenset(g.name for g in self.groups.all())
+
     @property
     def is_eic(self):
-        return any(g.name == "EIC" for g in self.groups.all())
+        return "EIC" in self.group_names
 
     @property
     def is_editor(self):
-        return any(g.name == "Editor" for g in self.groups.all())
+        return "Editor" in self.group_names
 
     @property
     def is_art_lead(self):
-        return any(g.name == "Art Lead" for g in self.groups.all())
+        return "Art Lead" in self.group_names
 
     @property
     def is_testsolve_coordinator(self):
-        return any(g.name == "Testsolve Coordinators" for g in self.groups.all())
+        return "Testsolve Coordinators" in self.group_names
 
     @property
     def full_display_name(self):
@@ -167,9 +195,7 @@ class User(AbstractUser):
             ret = username
 
         if linkify:
-            return format_html(
-                '<a href="{}">{}</a>', urls.reverse("user", args=[username]), ret
-            )
+            return format_html('<a href="{}">{}</a>', _user_url(username), ret)
         else:
             return ret
 
@@ -181,11 +207,14 @@ class User(AbstractUser):
 
     @staticmethod
     def html_user_list_of_flat(ud_pairs, linkify):
-        # iterate over ud_pairs exactly once
-        s = format_html_join(
-            ", ",
-            "{}",
-            ((User.html_user_display_of_flat(un, dn, linkify),) for un, dn in ud_pairs),
+        # iterate over ud_pairs exactly once; display_of_flat may return a bare
+        # username, so escape (a no-op for the format_html results) and join
+        # directly rather than re-parsing a "{}" template per user
+        s = mark_safe(
+            ", ".join(
+                conditional_escape(User.html_user_display_of_flat(un, dn, linkify))
+                for un, dn in ud_pairs
+            )
         )
         return s or mark_safe('<span class="empty">--</span>')
 
@@ -213,7 +242,14 @@ class User(AbstractUser):
         )
 
     def get_absolute_url(self):
-        return urls.reverse("user", kwargs={"username": self.username})
+        return _user_url(self.username)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def clear_group_names(sender, instance, action, reverse, **kwargs):
+    # Only the forward side (user.groups.add etc.) gives us the user object
+    if not reverse and action.startswith("post_"):
+        instance.__dict__.pop("group_names", None)
 
 
 class Round(models.Model):
@@ -284,7 +320,7 @@ class PuzzleAnswer(models.Model):
     def normalize_answer(self, answer, ignore_case=True, ignore_whitespace=True):
         normalized = answer
         if ignore_whitespace:
-            normalized = "".join(c for c in normalized if not c.isspace())
+            normalized = "".join(normalized.split())
         if ignore_case:
             normalized = normalized.upper()
 
@@ -321,24 +357,33 @@ class PuzzleTag(models.Model):
         return urls.reverse("single_tag", kwargs={"id": self.id})
 
 
+@functools.cache
+def _codename_words() -> tuple[frozenset[str], frozenset[str]]:
+    """Returns the (adjectives, nouns) that codenames are built from."""
+    data_dir = settings.BASE_DIR / "puzzle_editing/data"
+    with (data_dir / "adj-eng.txt").open() as f:
+        adjs = frozenset(line.strip() for line in f)
+    with (data_dir / "nouns-eng.txt").open() as f:
+        nouns = frozenset(line.strip() for line in f)
+    return adjs, nouns
+
+
 def generate_codename():
-    used_codenames = Puzzle.objects.values_list("codename", flat=True)
+    used_codenames = set(Puzzle.objects.values_list("codename", flat=True))
     used_adjs = {name.split("-", 1)[0] for name in used_codenames}
     used_nouns = {name.split("-", 1)[-1] for name in used_codenames}
 
-    with (settings.BASE_DIR / "puzzle_editing/data/nouns-eng.txt").open() as f:
-        nouns = {line.strip() for line in f.readlines()}
-    nouns = list(nouns - used_nouns if nouns - used_nouns else nouns)
+    all_adjs, all_nouns = _codename_words()
+
+    nouns = list(all_nouns - used_nouns or all_nouns)
     random.shuffle(nouns)
 
-    with (settings.BASE_DIR / "puzzle_editing/data/adj-eng.txt").open() as g:
-        adjs = {line.strip() for line in g.readlines()}
-    adjs = list(set(adjs) - used_adjs if set(adjs) - used_adjs else adjs)
+    adjs = list(all_adjs - used_adjs or all_adjs)
     random.shuffle(adjs)
 
     try:
         name = adjs.pop() + "-" + nouns.pop()
-        while Puzzle.objects.filter(codename=name).exists():
+        while name in used_codenames:
             name = adjs.pop() + "-" + nouns.pop()
     except IndexError:
         return "Make up your own name!"
@@ -359,6 +404,7 @@ class Puzzle(DirtyFieldsMixin, models.Model):
     discord_channel_id = models.CharField(
         max_length=19,
         blank=True,
+        db_index=True,
     )
     discord_info_message_id = models.CharField(
         max_length=19,
@@ -400,7 +446,7 @@ class Puzzle(DirtyFieldsMixin, models.Model):
         choices=status.DESCRIPTIONS.items(),
         default=status.INITIAL_IDEA,
     )
-    status_mtime = models.DateTimeField(editable=False)
+    status_mtime = models.DateTimeField(editable=False, default=timezone.now)
 
     last_updated = models.DateTimeField(auto_now=True)
 
@@ -505,6 +551,7 @@ class Puzzle(DirtyFieldsMixin, models.Model):
             ("unspoil_puzzle", "Can unspoil people"),
             ("change_status_puzzle", "Can change puzzle status"),
         )
+        indexes = (models.Index(fields=["status"]),)
 
     def __str__(self):
         return self.spoiler_free_title()
@@ -603,13 +650,18 @@ class Puzzle(DirtyFieldsMixin, models.Model):
     def get_emails(self, exclude_emails=()):
         # tcs = User.objects.filter(groups__name__in=['Testsolve Coordinators']).exclude(email="").values_list("email", flat=True)
 
-        emails = set(self.authors.values_list("email", flat=True))
-        emails |= set(self.editors.values_list("email", flat=True))
-        emails |= set(self.factcheckers.values_list("email", flat=True))
-        emails |= set(self.postprodders.values_list("email", flat=True))
-
-        emails -= set(exclude_emails)
-        emails -= {""}
+        emails = (
+            User.objects.filter(
+                models.Q(authored_puzzles=self)
+                | models.Q(editing_puzzles=self)
+                | models.Q(factchecking_puzzles=self)
+                | models.Q(postprodding_puzzles=self)
+            )
+            .exclude(email__in=exclude_emails)
+            .exclude(email="")
+            .values_list("email", flat=True)
+            .distinct()
+        )
 
         return list(emails)
 
@@ -653,13 +705,13 @@ class Puzzle(DirtyFieldsMixin, models.Model):
             return False
 
     def has_hints(self):
-        return self.hints.count() > 0
+        return self.hints.exists()
 
     def ordered_hints(self):
         return self.hints.order_by("order")
 
     def has_answer(self):
-        return self.answers.count() > 0
+        return self.answers.exists()
 
     @property
     def postprod_url(self):
@@ -677,10 +729,7 @@ class Puzzle(DirtyFieldsMixin, models.Model):
     def author_byline(self):
         credits = [u.credits_name for u in self.authors.all()]
         credits.sort(key=lambda u: u.upper())
-        if len(credits) == 2:
-            return " and ".join(credits)
-        else:
-            return re.sub(r"([^,]+?), ([^,]+?)$", r"\1, and \2", ", ".join(credits))
+        return _join_names(credits, oxford_comma=True)
 
     @property
     def answer(self):
@@ -692,45 +741,43 @@ class Puzzle(DirtyFieldsMixin, models.Model):
 
     @property
     def round(self):
-        return next(iter(a.round for a in self.answers.all()), None)
+        answers = self.answers.all()
+        return answers[0].round if answers else None
 
     @property
     def round_name(self):
-        return next(iter(a.round.name for a in self.answers.all()), None)
+        puzzle_round = self.round
+        return puzzle_round.name if puzzle_round else None
 
     @property
     def metadata(self):
+        """Deploy metadata for this puzzle.
+
+        When building this for many puzzles, prefetch "authors", "editors",
+        "answers" and "other_credits__users" to avoid per-puzzle queries.
+        """
         editors = [u.credits_name for u in self.editors.all()]
         editors.sort(key=lambda u: u.upper())
-        postprodders = [u.credits_name for u in self.postprodders.all()]
-        postprodders.sort(key=lambda u: u.upper())
+        answers = list(self.answers.all())
         return {
             "puzzle_title": self.name,
             "credits": f"by {self.author_byline}",
-            "answer": self.answer or "???",
-            "round": next(iter(a.round_id for a in self.answers.all()), 1),
+            "answer": ", ".join(a.answer for a in answers) or "???",
+            "round": answers[0].round_id if answers else 1,
             "puzzle_idea_id": self.id,
             "other_credits": {
                 c.credit_type: [
-                    re.sub(
-                        r"([^,]+?), ([^,]+?)$",
-                        r"\1 and \2",
-                        ", ".join([u.credits_name for u in c.users.all()]),
-                    ),
+                    _join_names([u.credits_name for u in c.users.all()]),
                     c.text,
                 ]
                 for c in self.other_credits.all()
             },
             "additional_authors": self.authors_addl,
-            "editors": re.sub(r"([^,]+?), ([^,]+?)$", r"\1 and \2", ", ".join(editors)),
-            # "postprodders": re.sub(r"([^,]+?), ([^,]+?)$", r"\1 and \2", ", ".join(postprodders)),
+            "editors": _join_names(editors),
+            # "postprodders": _join_names(postprodders),
             "puzzle_slug": self.postprod.slug
             if self.has_postprod()
-            else re.sub(
-                r'[<>#%\'"|{}\[\])(\\\^?=`;@&,]',
-                "",
-                re.sub(r"[ \/]+", "-", self.name),
-            ).lower(),
+            else _SLUG_STRIP_RE.sub("", _SLUG_SEPARATOR_RE.sub("-", self.name)).lower(),
         }
 
     @property
@@ -798,6 +845,7 @@ class Puzzle(DirtyFieldsMixin, models.Model):
 
         return yaml.dump(
             [puzzle_data, spoilr_puzzle_data, *hint_data, *pseudoanswers_data],
+            Dumper=_YAML_DUMPER,
             sort_keys=False,
         )
 
@@ -887,25 +935,31 @@ def send_status_notifications(puzzle: Puzzle) -> None:
             subscriptions,
         )
 
+    # Everything below only feeds the discord hype message
+    c = discord.get_client()
+    if not c:
+        return
+
     should_hype = False
     # Hype a puzzle if (a) it's going into open testsolving (b) this is the first
-    # time it's entered a status group
+    # time it's entered a status group (only this change's comment moved it
+    # there; [1:2] checks for a second one without counting them all)
     if (
         puzzle.status == status.TESTSOLVING and not puzzle.logistics_closed_testsolving
     ) or any(
         puzzle.status in group
-        and puzzle.comments.filter(status_change__in=group).count() <= 1
+        and not puzzle.comments.filter(status_change__in=group)[1:2].exists()
         for group in DISCORD_NOTICE_STATUS_GROUPS
     ):
         should_hype = True
 
-    re_testing = (
-        puzzle.status == status.TESTSOLVING
-        and puzzle.comments.filter(status_change__in=status.TESTSOLVING).count() > 1
-    )
-
     # Check if this is the first time the puzzle has entered this group of statuses
-    if (c := discord.get_client()) and should_hype:
+    if should_hype:
+        re_testing = (
+            puzzle.status == status.TESTSOLVING
+            and puzzle.comments.filter(status_change=status.TESTSOLVING)[1:2].exists()
+        )
+
         message = random.choice(DISCORD_NOTICE_CELEBRATION_SENTENCE)
         message += f" Congrats to author(s) {", ".join(discord.mention_users(puzzle.authors.all()))}"
         if puzzle.editors.exists():
@@ -1042,7 +1096,7 @@ class PseudoAnswer(models.Model):
 
     def normalize(self, text):
         normalized = text
-        normalized = "".join(c for c in normalized if not c.isspace())
+        normalized = "".join(normalized.split())
         normalized = normalized.upper()
         return normalized
 
@@ -1078,12 +1132,7 @@ class PuzzleCredit(models.Model):
 
     def __str__(self):
         return f"{self.get_credit_type_display()}: %s" % (
-            re.sub(
-                r"([^,]+?), ([^,]+?)$",
-                r"\1 and \2",
-                ", ".join([u.credits_name for u in self.users.all()]),
-            )
-            or "--"
+            _join_names([u.credits_name for u in self.users.all()]) or "--"
         )
 
     def get_absolute_url(self):
@@ -1168,13 +1217,11 @@ class SupportRequest(models.Model):
         )
 
     def get_emails(self) -> list[str]:
-        emails = {
-            u.email
-            for u in User.objects.filter(
-                groups__name=self.TEAM_TO_GROUP[self.Team[self.team]]
-            )
-            if u.email
-        }
+        emails = set(
+            User.objects.filter(groups__name=self.TEAM_TO_GROUP[self.Team[self.team]])
+            .exclude(email="")
+            .values_list("email", flat=True)
+        )
         if self.team_notes_updater and self.team_notes_updater.email:
             emails.add(self.team_notes_updater.email)
 
@@ -1263,10 +1310,14 @@ class StatusSubscription(models.Model):
 class PuzzleVisited(models.Model):
     """A model keeping track of when a user last visited a puzzle page."""
 
-    puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE)
+    # The (puzzle, user) unique index already covers lookups by puzzle
+    puzzle = models.ForeignKey(Puzzle, on_delete=models.CASCADE, db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        unique_together = ("puzzle", "user")
+
     def __str__(self):
         return f"{self.user} visited {self.puzzle}"
 
@@ -1317,9 +1368,8 @@ class TestsolveSession(models.Model):
 
     def get_time_since_started(self):
         td = datetime.datetime.now(tz=datetime.UTC) - self.started
-        minutes = td.total_seconds() / 60.0
-        hours, minutes = divmod(minutes, 60.0)
-        days, hours = divmod(hours, 24.0)
+        hours, minutes = divmod(int(td.total_seconds()) // 60, 60)
+        days, hours = divmod(hours, 24)
         return days, hours, minutes
 
     @property
@@ -1335,9 +1385,10 @@ class TestsolveSession(models.Model):
             [
                 time
                 for time in [
-                    f"{int(days)}d" if days > 0 else None,
-                    f"{int(hours):02}h" if hours > 0 else None,
-                    f"{int(minutes):02}m" if minutes > 0 else None,
+                    f"{days}d" if days > 0 else None,
+                    f"{hours:02}h" if hours > 0 else None,
+                    # Sessions under a minute old show "00m" rather than nothing
+                    f"{minutes:02}m" if minutes > 0 or hours == 0 else None,
                 ]
                 if time
             ]
@@ -1347,22 +1398,40 @@ class TestsolveSession(models.Model):
     def ended(self):
         return len(self.active_participants()) == 0
 
+    def _participations_with_users(self):
+        participations = self.participations.all()
+        # select_related would bypass a participations__user prefetch
+        if "participations" not in getattr(self, "_prefetched_objects_cache", {}):
+            participations = participations.select_related("user")
+        return participations
+
     def participants(self) -> Iterable[User]:
-        for p in self.participations.select_related("user").all():
+        for p in self._participations_with_users():
             yield p.user
 
     def active_participants(self):
-        return [p.user for p in self.participations.all() if p.ended is None]
+        return [p.user for p in self._participations_with_users() if p.ended is None]
 
+    # Views that list sessions may annotate participation_count,
+    # participation_done_count, has_correct and avg_* (see views.puzzle);
+    # the methods below use those aggregates when they're present.
     def get_done_participants_display(self):
+        if hasattr(self, "participation_count"):
+            return f"{self.participation_done_count} / {self.participation_count}"
         participations = list(self.participations.all())
         done_participations = [p for p in participations if p.ended is not None]
         return f"{len(done_participations)} / {len(participations)}"
 
     def has_correct_guess(self):
-        return any(g.correct for g in self.guesses.all())
+        if hasattr(self, "has_correct"):
+            return self.has_correct
+        if "guesses" in getattr(self, "_prefetched_objects_cache", {}):
+            return any(g.correct for g in self.guesses.all())
+        return self.guesses.filter(correct=True).exists()
 
     def get_average_fun(self):
+        if hasattr(self, "avg_fun"):
+            return self.avg_fun
         try:
             return statistics.mean(
                 p.fun_rating
@@ -1373,6 +1442,8 @@ class TestsolveSession(models.Model):
             return None
 
     def get_average_diff(self):
+        if hasattr(self, "avg_diff"):
+            return self.avg_diff
         try:
             return statistics.mean(
                 p.difficulty_rating
@@ -1383,6 +1454,8 @@ class TestsolveSession(models.Model):
             return None
 
     def get_average_hours(self):
+        if hasattr(self, "avg_hours"):
+            return self.avg_hours
         try:
             return statistics.mean(
                 p.hours_spent
@@ -1394,10 +1467,10 @@ class TestsolveSession(models.Model):
 
     def get_emails(self, exclude_emails=()):
         emails = set(self.puzzle.get_emails())
-        emails |= {p.email for p in self.participants() if p.email is not None}
+        emails |= set(self.participations.values_list("user__email", flat=True))
 
         emails -= set(exclude_emails)
-        emails -= {""}
+        emails -= {"", None}
 
         return list(emails)
 
@@ -1486,6 +1559,9 @@ class PuzzleComment(models.Model):
         help_text="Any status change caused by this comment. Only used for recording history and computing statistics; not a source of truth (i.e. the puzzle will still store its current status, and this field's value on any comment doesn't directly imply anything about that in any technically enforced way).",
     )
 
+    class Meta:
+        indexes = (models.Index(fields=["puzzle", "-date"]),)
+
     def __str__(self):
         return f"Comment #{self.id} on {self.puzzle}"
 
@@ -1647,8 +1723,11 @@ class TestsolveParticipation(models.Model):
         help_text="Do you have suggestions for things that should definitely stay in the puzzle? Please explain what you like about them.",
     )
 
+    class Meta:
+        indexes = (models.Index(fields=["session", "user"]),)
+
     def __str__(self):
-        return f"Testsolve participation: {self.user.username} in Session #{self.session.id}"
+        return f"Testsolve participation: {self.user.username} in Session #{self.session_id}"
 
 
 @receiver(post_save, sender=TestsolveParticipation)
@@ -1660,12 +1739,13 @@ def add_testsolver_to_thread(
     c = discord.get_client()
     if c:
         session = instance.session
-        if instance.user.discord_user_id:
+        if session.discord_thread_id and instance.user.discord_user_id:
             c.add_member_to_thread(
                 session.discord_thread_id, instance.user.discord_user_id
             )
             instance.in_discord_thread = True
-            instance.save()
+            # Don't rewrite all the feedback fields just to set the flag
+            instance.save(update_fields=["in_discord_thread"])
 
 
 class TestsolveGuess(models.Model):
@@ -1683,31 +1763,50 @@ class TestsolveGuess(models.Model):
 
     class Meta:
         verbose_name_plural = "testsolve guesses"
+        indexes = (
+            # Used to check whether a session has been solved
+            models.Index(
+                fields=["session"],
+                condition=models.Q(correct=True),
+                name="puzzle_edit_guess_correct_idx",
+            ),
+        )
 
     def __str__(self):
         correct_text = "Correct" if self.correct else "Incorrect"
-        return f"{self.guess}: {correct_text} guess by {self.user.username} in Session #{self.session.id}"
+        return f"{self.guess}: {correct_text} guess by {self.user.username} in Session #{self.session_id}"
+
+
+def _has_member(manager, user: User) -> bool:
+    # Read the M2M from the prefetch cache when the caller prefetched it;
+    # otherwise ask the database about this one user instead of loading
+    # every member.
+    if manager.prefetch_cache_name in getattr(
+        manager.instance, "_prefetched_objects_cache", {}
+    ):
+        return any(u.id == user.id for u in manager.all())
+    return manager.filter(id=user.id).exists()
 
 
 def is_spoiled_on(user: User, puzzle: Puzzle) -> bool:
     # should use prefetch_related("spoiled") when using this
-    return user.is_eic or user in puzzle.spoiled.all()
+    return user.is_eic or _has_member(puzzle.spoiled, user)
 
 
 def is_author_on(user: User, puzzle: Puzzle) -> bool:
-    return user in puzzle.authors.all()
+    return _has_member(puzzle.authors, user)
 
 
 def is_editor_on(user: User, puzzle: Puzzle) -> bool:
-    return user in puzzle.editors.all()
+    return _has_member(puzzle.editors, user)
 
 
 def is_factchecker_on(user: User, puzzle: Puzzle) -> bool:
-    return user in puzzle.factcheckers.all()
+    return _has_member(puzzle.factcheckers, user)
 
 
 def is_postprodder_on(user: User, puzzle: Puzzle) -> bool:
-    return user in puzzle.postprodders.all()
+    return _has_member(puzzle.postprodders, user)
 
 
 def get_user_role(user: User, puzzle: Puzzle) -> str | None:
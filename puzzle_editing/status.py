@@ -47,11 +47,12 @@ STATUSES = [
 ]
 
 
+_STATUS_RANKS = {status: rank for rank, status in enumerate(STATUSES)}
+
+
 def get_status_rank(status):
-    try:
-        return STATUSES.index(status)
-    except ValueError:  # not worth crashing imo
-        return -1
+    # not worth crashing on unknown statuses imo
+    return _STATUS_RANKS.get(status, -1)
 
 
 def past_writing(status):
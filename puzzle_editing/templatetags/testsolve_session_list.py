@@ -1,5 +1,5 @@
 from django import template
-from django.db.models import Exists, OuterRef, Subquery
+from django.db.models import Exists, OuterRef, Prefetch, Subquery
 
 from puzzle_editing.models import TestsolveParticipation, User, get_user_role
 
@@ -31,7 +31,16 @@ def testsolve_session_list(
         )
         .order_by("puzzle__priority")
         .select_related("puzzle")
-        .prefetch_related("participations__user")
+        .prefetch_related(
+            # The list only shows who's in each session and how many are
+            # done, so skip the long feedback TextFields
+            Prefetch(
+                "participations",
+                queryset=TestsolveParticipation.objects.only(
+                    "session", "user", "ended"
+                ).select_related("user"),
+            )
+        )
         .prefetch_related("puzzle__spoiled")
         .prefetch_related("puzzle__authors")
         .prefetch_related("puzzle__editors")
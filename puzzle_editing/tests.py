@@ -1,15 +1,39 @@
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from typing import NamedTuple
+from unittest import mock
 
 from django import urls
+from django.conf import settings
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from django.test import Client, TestCase
-from django.test.utils import override_settings
+from django.db import connection
+from django.db.models import Avg, Count, Q
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from requests import HTTPError
 
 from . import status
-from .models import Puzzle, Round, TestsolveParticipation, TestsolveSession, User
+from .discord import Client as DiscordClient
+from .discord import DiscordError
+from .management.commands.clean_discord_channels import (
+    Command as CleanDiscordChannelsCommand,
+)
+from .middleware import timezone_middleware
+from .models import (
+    PseudoAnswer,
+    Puzzle,
+    PuzzleAnswer,
+    Round,
+    TestsolveGuess,
+    TestsolveParticipation,
+    TestsolveSession,
+    User,
+    generate_codename,
+    get_user_role,
+)
 
 logging.disable(logging.DEBUG)  # there's a particular template lookup failure
 # in a view that really doesn't seem relevant
@@ -100,6 +124,90 @@ class Misc(TestCase):
             response.context["inbox_puzzles"].order_by("id"), [repr(self.puzzle3)]
         )
 
+    def test_session_stats(self):
+        self.participation1.fun_rating = 4
+        self.participation1.ended = timezone.now()
+        self.participation1.save()
+        TestsolveParticipation(session=self.session1, user=self.c, fun_rating=2).save()
+
+        annotated = TestsolveSession.objects.annotate(
+            participation_count=Count("participations"),
+            participation_done_count=Count(
+                "participations", filter=Q(participations__ended__isnull=False)
+            ),
+            avg_fun=Avg("participations__fun_rating"),
+            avg_diff=Avg("participations__difficulty_rating"),
+        ).get(pk=self.session1.pk)
+        for session in (self.session1, annotated):
+            self.assertEqual(session.get_done_participants_display(), "1 / 2")
+            self.assertEqual(session.get_average_fun(), 3)
+            self.assertIsNone(session.get_average_diff())
+
+    def test_participants_use_prefetch(self):
+        session = TestsolveSession.objects.prefetch_related("participations__user").get(
+            pk=self.session1.pk
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(list(session.participants()), [self.b])
+            self.assertEqual(session.active_participants(), [self.b])
+
+    def test_session_time_since_started(self):
+        self.session1.started = timezone.now() - timedelta(
+            days=2, hours=3, minutes=4, seconds=30
+        )
+        self.assertEqual(self.session1.time_since_started, "2d 03h 04m")
+        self.session1.started = timezone.now() - timedelta(seconds=30)
+        self.assertEqual(self.session1.time_since_started, "00m")
+        self.assertTrue(self.session1.is_expired)
+
+    def test_user_role(self):
+        self.assertEqual(get_user_role(self.b, self.puzzle3), "editor")
+        self.assertIsNone(get_user_role(self.c, self.puzzle3))
+
+        puzzle = Puzzle.objects.prefetch_related(
+            "authors", "editors", "postprodders", "factcheckers"
+        ).get(pk=self.puzzle3.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(self.a, puzzle), "author")
+            self.assertEqual(get_user_role(self.b, puzzle), "editor")
+            self.assertIsNone(get_user_role(self.c, puzzle))
+
+    @mock.patch("puzzle_editing.models.discord.get_client")
+    def test_add_testsolver_to_thread(self, get_client):
+        self.c.discord_user_id = "123"
+        self.c.save()
+
+        participation = TestsolveParticipation(session=self.session1, user=self.c)
+        participation.save()
+        get_client.return_value.add_member_to_thread.assert_not_called()
+
+        self.session1.discord_thread_id = "456"
+        participation.save()
+        get_client.return_value.add_member_to_thread.assert_called_once_with(
+            "456", "123"
+        )
+        participation.refresh_from_db()
+        self.assertTrue(participation.in_discord_thread)
+
+    def test_testsolve_str_only_needs_user(self):
+        TestsolveGuess.objects.create(
+            session=self.session1, user=self.b, guess="ANSWER", correct=False
+        )
+        # What the admins' list_select_related gives the changelists
+        participation = TestsolveParticipation.objects.select_related("user").get(
+            pk=self.participation1.pk
+        )
+        guess = TestsolveGuess.objects.select_related("user").get(session=self.session1)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                str(participation),
+                f"Testsolve participation: b in Session #{self.session1.id}",
+            )
+            self.assertEqual(
+                str(guess),
+                f"ANSWER: Incorrect guess by b in Session #{self.session1.id}",
+            )
+
     def test_mine(self):
         c = Client()
         c.login(username="b", password="password")
@@ -139,6 +247,17 @@ class Misc(TestCase):
         self.assertFalse(response.context["is_author"])
         self.assertTrue(response.context["is_editor"])
 
+    def test_puzzle_testsolve_sessions(self):
+        c = Client()
+        c.login(username="a", password="secret")
+
+        # The bare puzzle URL redirects to the one with the slug
+        response = c.get(urls.reverse("puzzle", args=[self.puzzle1.id]), follow=True)
+        self.assertEqual(response.status_code, 200)
+        (session,) = response.context["testsolve_sessions"]
+        self.assertEqual(list(session.participants()), [self.b])
+        self.assertEqual(session.get_done_participants_display(), "0 / 1")
+
     def test_puzzle_subpage_sanity(self):
         c = Client()
         c.login(username="a", password="secret")
@@ -165,6 +284,19 @@ class Misc(TestCase):
             response.context["testsolvable"][0]["puzzle"].id, self.puzzle1.id
         )
 
+    def test_testsolve_main_coordinator(self):
+        self.c.user_permissions.add(
+            Permission.objects.get(codename="change_testsolvesession")
+        )
+        c = Client()
+        c.login(username="c", password="password")
+
+        response = c.get(urls.reverse("testsolve_main"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context["all_current_sessions"]), [self.session1]
+        )
+
     def test_testsolve_one(self):
         ac = Client()
         ac.login(username="a", password="secret")
@@ -190,6 +322,21 @@ class Misc(TestCase):
         self.assertFalse(response.context["spoiled"])
         self.assertIsNone(response.context["participation"])
 
+    def test_testsolve_add_testsolvers(self):
+        bc = Client()
+        bc.login(username="b", password="password")
+
+        bc.post(
+            urls.reverse("testsolve_one", args=[self.session1.id]),
+            {"add_testsolvers": [self.b.id, self.c.id]},
+        )
+        self.assertCountEqual(
+            TestsolveParticipation.objects.filter(session=self.session1).values_list(
+                "user", flat=True
+            ),
+            [self.b.id, self.c.id],
+        )
+
     def test_testsolve_finish(self):
         ac = Client()
         ac.login(username="a", password="secret")
@@ -205,6 +352,40 @@ class Misc(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsNotNone(response.context["participation"])
 
+    def test_feedback_query_count(self):
+        ac = Client()
+        ac.login(username="a", password="secret")
+        url = urls.reverse("all_feedback")
+
+        self.participation1.ended = timezone.now()
+        self.participation1.save()
+        with CaptureQueriesContext(connection) as one_feedback:
+            self.assertEqual(ac.get(url).status_code, 200)
+
+        session = TestsolveSession.objects.create(puzzle=self.puzzle3)
+        for user in (self.c, self.eic):
+            TestsolveParticipation.objects.create(
+                session=session, user=user, ended=timezone.now()
+            )
+        with CaptureQueriesContext(connection) as three_feedbacks:
+            self.assertEqual(ac.get(url).status_code, 200)
+
+        self.assertEqual(len(three_feedbacks), len(one_feedback))
+
+    def test_testsolve_close(self):
+        self.eic.user_permissions.add(Permission.objects.get(codename="close_session"))
+        TestsolveParticipation(session=self.session1, user=self.c).save()
+        ec = Client()
+        ec.login(username="eic", password="super-secret")
+
+        response = ec.post(
+            urls.reverse("testsolve_close", args=[self.session1.id]), {"notes": ""}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(
+            self.session1.participations.filter(ended__isnull=True).exists()
+        )
+
     def test_rest_sanity(self) -> None:
         ac = Client()
         ac.login(username="a", password="secret")
@@ -262,3 +443,194 @@ class Misc(TestCase):
             403,
             "non-meta-editor shouldn't have access to rounds",
         )
+
+
+def discord_response(status_code, body, headers=None):
+    resp = mock.Mock(status_code=status_code, headers=headers or {})
+    resp.json.return_value = body
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = HTTPError(response=resp)
+    return resp
+
+
+class DiscordClientTest(TestCase):
+    @mock.patch("puzzle_editing.discord.client.time.sleep")
+    @mock.patch("puzzle_editing.discord.client.requests.Session.request")
+    def test_retries_rate_limited_requests(self, request, sleep):
+        request.side_effect = [
+            discord_response(429, {"retry_after": 0.5}),
+            discord_response(429, {}, {"Retry-After": "2"}),
+            discord_response(200, {"id": "1"}),
+        ]
+        client = DiscordClient("token", "guild", rate_limit_retries=2)
+
+        self.assertEqual(client.get_channel_pins("1"), {"id": "1"})
+        self.assertEqual(request.call_count, 3)
+        sleep.assert_has_calls([mock.call(0.5), mock.call(2.0)])
+
+    @mock.patch("puzzle_editing.discord.client.time.sleep")
+    @mock.patch("puzzle_editing.discord.client.requests.Session.request")
+    def test_gives_up_after_rate_limit_retries(self, request, sleep):
+        request.side_effect = [
+            discord_response(429, {"retry_after": 0.5}) for _ in range(3)
+        ]
+        client = DiscordClient("token", "guild", rate_limit_retries=2)
+
+        with self.assertRaises(HTTPError):
+            client.get_channel_pins("1")
+        self.assertEqual(request.call_count, 3)
+
+    @mock.patch("puzzle_editing.discord.client.time.sleep")
+    @mock.patch("puzzle_editing.discord.client.requests.Session.request")
+    def test_no_retries_by_default(self, request, sleep):
+        request.return_value = discord_response(429, {"retry_after": 0.5})
+        client = DiscordClient("token", "guild")
+
+        with self.assertRaises(HTTPError):
+            client.get_channel_pins("1")
+        self.assertEqual(request.call_count, 1)
+        sleep.assert_not_called()
+
+
+@override_settings(DISCORD_BOT_TOKEN=None)
+class CleanDiscordChannelsTest(TestCase):
+    # The puzzles are loaded on the main thread and organize_puzzle is mocked
+    # out, so the worker threads never touch the database. They couldn't see
+    # this test's uncommitted data through their own connections anyway.
+    def setUp(self):
+        # Puzzle.save() saves twice, so objects.create()'s force_insert would
+        # try to insert the row again
+        self.puzzles = []
+        for i, s in enumerate(
+            [status.TESTSOLVING, status.INITIAL_IDEA, status.TESTSOLVING]
+        ):
+            puzzle = Puzzle(
+                name=f"Puzzle {i}",
+                codename=f"codename-{i}",
+                status=s,
+                status_mtime=datetime.fromtimestamp(0),
+            )
+            puzzle.save()
+            self.puzzles.append(puzzle)
+        self.command = CleanDiscordChannelsCommand()
+
+    def test_puzzles_grouped_by_status(self):
+        calls = []
+
+        def record(client, p):
+            calls.append((threading.get_ident(), p.status, p.id))
+
+        with mock.patch.object(self.command, "organize_puzzle", side_effect=record):
+            self.command.organize_puzzles(mock.Mock(), workers=4)
+
+        self.assertCountEqual([c[2] for c in calls], [p.id for p in self.puzzles])
+        threads_by_status: dict[str, set[int]] = {}
+        for thread, puzzle_status, _ in calls:
+            threads_by_status.setdefault(puzzle_status, set()).add(thread)
+        # Every status is handled serially by a single worker
+        self.assertEqual(
+            {s: len(t) for s, t in threads_by_status.items()},
+            {status.TESTSOLVING: 1, status.INITIAL_IDEA: 1},
+        )
+
+    def test_worker_exceptions_propagate(self):
+        with (
+            mock.patch.object(
+                self.command, "organize_puzzle", side_effect=DiscordError("boom")
+            ),
+            self.assertRaises(DiscordError),
+        ):
+            self.command.organize_puzzles(mock.Mock(), workers=2)
+
+
+class TimezoneMiddlewareTest(TestCase):
+    def setUp(self):
+        self.middleware = timezone_middleware(
+            lambda request: timezone.get_current_timezone_name()
+        )
+        self.addCleanup(timezone.deactivate)
+
+    def test_activates_user_timezone(self):
+        user = create_user("tz")
+        user.timezone = "America/Los_Angeles"
+        request = RequestFactory().get("/")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "session"
+        request.user = user
+
+        self.assertEqual(self.middleware(request), "America/Los_Angeles")
+
+    def test_skips_user_without_session_cookie(self):
+        request = RequestFactory().get("/")
+        # Any attribute access on the user would raise
+        request.user = mock.NonCallableMock(spec=[])
+
+        self.assertEqual(self.middleware(request), settings.TIME_ZONE)
+
+    async def test_async_activates_user_timezone(self):
+        user = User(username="tz", timezone="America/Los_Angeles")
+
+        async def get_response(request):
+            return timezone.get_current_timezone_name()
+
+        async def auser():
+            return user
+
+        request = RequestFactory().get("/")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "session"
+        request.auser = auser
+
+        middleware = timezone_middleware(get_response)
+        self.assertEqual(await middleware(request), "America/Los_Angeles")
+        self.assertEqual(timezone.get_current_timezone_name(), settings.TIME_ZONE)
+
+
+class UserGroupsTest(TestCase):
+    def test_group_changes_clear_cached_roles(self):
+        user = create_user("roles")
+        eic = Group.objects.create(name="EIC")
+        self.assertFalse(user.is_eic)
+
+        user.groups.add(eic)
+        self.assertTrue(user.is_eic)
+        self.assertEqual(user.hat, "🎩")
+
+        user.groups.remove(eic)
+        self.assertFalse(user.is_eic)
+
+
+class UserListHtmlTest(TestCase):
+    def test_html_user_list_of_flat(self):
+        self.assertEqual(
+            User.html_user_list_of_flat([("a<b", ""), ("c", "Cee")], linkify=False),
+            'a&lt;b, <span data-tippy-content="c">Cee</span>',
+        )
+        self.assertEqual(
+            User.html_user_list_of_flat([], linkify=False),
+            '<span class="empty">--</span>',
+        )
+
+
+class AnswerCheckingTest(TestCase):
+    def test_is_correct(self):
+        answer = PuzzleAnswer(answer="Foo Bar")
+        self.assertTrue(answer.is_correct(" foo\tBAR\u3000"))
+        self.assertFalse(answer.is_correct("foo baz"))
+
+        answer = PuzzleAnswer(
+            answer="Foo Bar", case_sensitive=True, whitespace_sensitive=True
+        )
+        self.assertTrue(answer.is_correct("Foo Bar"))
+        self.assertFalse(answer.is_correct("FOO BAR"))
+        self.assertFalse(answer.is_correct("FooBar"))
+
+        self.assertTrue(PseudoAnswer(answer="foo bar").is_correct("FOO\nBAR"))
+
+
+class GenerateCodenameTest(TestCase):
+    @mock.patch(
+        "puzzle_editing.models._codename_words",
+        return_value=(frozenset({"red", "blue"}), frozenset({"fox"})),
+    )
+    def test_skips_taken_codenames(self, _codename_words):
+        Puzzle(name="Taken", codename="red-fox").save()
+        self.assertEqual(generate_codename(), "blue-fox")
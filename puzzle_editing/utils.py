@@ -29,7 +29,20 @@ def export_all():
     repo.checkout_branch(branch_name)
 
     # Export all puzzles with an assigned answer.
-    puzzles = Puzzle.objects.filter(answers__isnull=False).distinct()
+    puzzles = (
+        Puzzle.objects.filter(answers__isnull=False)
+        .distinct()
+        .select_related("postprod")
+        .prefetch_related(
+            "authors",
+            "editors",
+            "postprodders",
+            "answers",
+            "other_credits__users",
+            "hints",
+            "pseudo_answers",
+        )
+    )
 
     fixture_path = repo.fixture_path()
     for puzzle in puzzles:
@@ -40,7 +53,7 @@ def export_all():
             pp = PuzzlePostprod(puzzle=puzzle, slug=puzzle.slug)
             pp.save()
 
-        with (Path(fixture_path) / f"{pp.slug}.yaml").open("w") as f:
+        with (fixture_path / f"{pp.slug}.yaml").open("w") as f:
             f.write(puzzle.get_yaml_fixture())
 
     if repo.commit("Export puzzle fixtures"):
@@ -37,6 +37,7 @@ from django.db.models import (
     F,
     Max,
     OuterRef,
+    Prefetch,
     Q,
     Subquery,
 )
@@ -44,6 +45,7 @@ from django.db.models.functions import Lower
 from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.http import urlencode
 from django.utils.safestring import mark_safe
 from django.utils.text import slugify
@@ -611,7 +613,9 @@ def puzzle_hints(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
 
 @login_required
 def puzzle_other_credits(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
-    puzzle: Puzzle = get_object_or_404(Puzzle, id=id)
+    puzzle: Puzzle = get_object_or_404(
+        Puzzle.objects.prefetch_related("other_credits__users"), id=id
+    )
     if request.method == "POST":
         form = PuzzleOtherCreditsForm(request.POST)
         if form.is_valid():
@@ -670,7 +674,7 @@ def puzzle(
             .prefetch_related("factcheckers")
             .prefetch_related("pseudo_answers")
             .prefetch_related("hints")
-            .prefetch_related("other_credits")
+            .prefetch_related("other_credits__users")
             .prefetch_related("tags")
         ),
         id=id,
@@ -692,10 +696,12 @@ def puzzle(
         Puzzle, form=LogisticsInfoForm, exclude=exclude
     )
 
-    vis, vis_created = PuzzleVisited.objects.get_or_create(puzzle=puzzle, user=user)
-    if not vis_created:
-        # update the auto_now=True DateTimeField anyway
-        vis.save()
+    # Bump the visit time with a single UPDATE, only creating the row on the
+    # first visit (update() skips auto_now, so set the date explicitly)
+    if not PuzzleVisited.objects.filter(puzzle=puzzle, user=user).update(
+        date=timezone.now()
+    ):
+        PuzzleVisited.objects.get_or_create(puzzle=puzzle, user=user)
 
     def add_system_comment_here(message, status_change="", send_discord=False):
         add_comment(
@@ -781,7 +787,7 @@ def puzzle(
                         send_email=False,
                         content="Puzzle status changed, automaticaly marking session as no longer listed",
                     )
-                    session.save()
+                    session.save(update_fields=["joinable"])
 
         elif "change_priority" in request.POST:
             form = PuzzlePriorityForm(request.POST, instance=puzzle)
@@ -965,11 +971,6 @@ def puzzle(
             .all()
         )
 
-        # TODO: participants is still hitting the database once per session;
-        # might be possible to craft a Prefetch to get the list of
-        # participants; or maybe we can abstract out the handrolled user list
-        # logic and combine with the other views that do this
-
         # I inspected the query and Count with filter does become a SUM of CASE
         # expressions so it's using the same left join as everything else,
         # correctly for what we want
@@ -989,8 +990,16 @@ def puzzle(
                 avg_hours=Avg("participations__hours_spent"),
             )
             .select_related("puzzle")
-            .prefetch_related("participations__user")
-            .prefetch_related("guesses")
+            .prefetch_related(
+                # Only the participant list is shown; the stats come from the
+                # annotations above, so skip the long feedback TextFields
+                Prefetch(
+                    "participations",
+                    queryset=TestsolveParticipation.objects.only(
+                        "session", "user", "ended"
+                    ).select_related("user"),
+                )
+            )
         )
         is_author = is_author_on(user, puzzle)
         is_editor = is_editor_on(user, puzzle)
@@ -1992,7 +2001,6 @@ def testsolve_main(request: AuthenticatedHttpRequest) -> HttpResponse:
                 )
             )
             .order_by("started")
-            .prefetch_related("participations")
         )
         puzzles_with_closed_testsolving = (
             Puzzle.objects.filter(
@@ -2100,8 +2108,14 @@ def testsolve_start(request: AuthenticatedHttpRequest) -> HttpResponse:
             f"Adding testsolvers: {", ".join(discord.mention_users(participants))}",
         )
 
-    for p in participants:
-        TestsolveParticipation(session=session, user=p, in_discord_thread=True).save()
+    # bulk_create skips post_save, but add_testsolver_to_thread has nothing to
+    # do for participants that are already in_discord_thread
+    TestsolveParticipation.objects.bulk_create(
+        [
+            TestsolveParticipation(session=session, user=p, in_discord_thread=True)
+            for p in participants
+        ]
+    )
 
     session.joinable = is_joinable
     session.save()
@@ -2222,7 +2236,9 @@ def testsolve_queryset_to_csv(qs) -> HttpResponse:
 @login_required
 def testsolve_csv(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
     session = get_object_or_404(TestsolveSession, id=id)
-    queryset = TestsolveParticipation.objects.filter(session=session)
+    queryset = TestsolveParticipation.objects.filter(session=session).select_related(
+        "session__puzzle", "user"
+    )
     # opts = queryset.model._meta  # pylint: disable=protected-access
     # response = HttpResponse(content_type="text/csv")
     # response['Content-Disposition'] = 'attachment;filename=export.csv'
@@ -2343,7 +2359,7 @@ def testsolve_one(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
                     )
 
                     session.joinable = False
-                    session.save()
+                    session.save(update_fields=["joinable"])
 
                 # Send a congratulatory message to the thread.
                 discord.safe_post_message(
@@ -2396,7 +2412,7 @@ def testsolve_one(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
 
         elif "change_joinable" in request.POST:
             session.joinable = request.POST["change_joinable"] == "1"
-            session.save()
+            session.save(update_fields=["joinable"])
 
         elif "add_comment" in request.POST:
             comment_form = PuzzleCommentForm(request.POST)
@@ -2422,12 +2438,11 @@ def testsolve_one(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
         elif "add_testsolvers" in request.POST:
             new_testers = User.objects.filter(
                 pk__in=request.POST.getlist("add_testsolvers")
-            )
+            ).exclude(testsolve_participations__session=session)
+            # Saved one by one so add_testsolver_to_thread adds each of them to
+            # the discord thread
             for new_tester in new_testers:
-                if not TestsolveParticipation.objects.filter(
-                    session=session, user=new_tester
-                ).exists():
-                    TestsolveParticipation(session=session, user=new_tester).save()
+                TestsolveParticipation(session=session, user=new_tester).save()
 
         elif "get_help" in request.POST:
             ### SEND CUSTOM EMAIL TO Testsolve Coordinators
@@ -2542,7 +2557,7 @@ def testsolve_escape(request: AuthenticatedHttpRequest, id: int) -> HttpResponse
     participation.delete()
     if len(session.active_participants()) == 0:
         session.joinable = False
-        session.save()
+        session.save(update_fields=["joinable"])
     if (
         (c := discord.get_client())
         and participation.session.discord_thread_id
@@ -2566,7 +2581,9 @@ def testsolve_escape(request: AuthenticatedHttpRequest, id: int) -> HttpResponse
 def testsolve_feedback(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
     session = get_object_or_404(TestsolveSession, id=id)
 
-    feedback = session.participations.filter(ended__isnull=False)
+    feedback = session.participations.filter(ended__isnull=False).select_related(
+        "session__puzzle", "user"
+    )
     no_feedback = session.participations.filter(ended__isnull=True)
 
     context = {
@@ -2587,7 +2604,7 @@ def puzzle_feedback(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
     feedback = (
         TestsolveParticipation.objects.filter(session__puzzle=puzzle)
         .filter(ended__isnull=False)
-        .select_related("session")
+        .select_related("session__puzzle", "user")
         .order_by("session__id")
     )
 
@@ -2605,7 +2622,7 @@ def puzzle_feedback(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
 def puzzle_feedback_all(request: AuthenticatedHttpRequest) -> HttpResponse:
     feedback = (
         TestsolveParticipation.objects.filter(ended__isnull=False)
-        .select_related("session")
+        .select_related("session__puzzle", "user")
         .order_by("session__puzzle__id", "session__id")
     )
 
@@ -2620,7 +2637,7 @@ def puzzle_feedback_csv(request: AuthenticatedHttpRequest, id: int) -> HttpRespo
     feedback = (
         TestsolveParticipation.objects.filter(session__puzzle=puzzle)
         .filter(ended__isnull=False)
-        .select_related("session")
+        .select_related("session__puzzle", "user")
         .order_by("session__id")
     )
 
@@ -2631,7 +2648,7 @@ def puzzle_feedback_csv(request: AuthenticatedHttpRequest, id: int) -> HttpRespo
 def puzzle_feedback_all_csv(request: AuthenticatedHttpRequest) -> HttpResponse:
     feedback = (
         TestsolveParticipation.objects.filter(ended__isnull=False)
-        .select_related("session")
+        .select_related("session__puzzle", "user")
         .order_by("session__puzzle__id", "session__id")
     )
 
@@ -2785,17 +2802,17 @@ def testsolve_close(request: AuthenticatedHttpRequest, id: int) -> HttpResponse:
                     status_change=status.WRITING if change_status else "",
                 )
 
-                # End all participations in session
-                for p in session.participations.all():
-                    p.ended = datetime.datetime.now()
-                    p.save()
+                # End all participations in session. A single UPDATE skips
+                # add_testsolver_to_thread, which has no reason to add anyone
+                # to the thread of a session that's closing.
+                session.participations.update(ended=datetime.datetime.now())
 
                 if change_status:
                     puzzle.status = status.WRITING
                     puzzle.save()
 
                 session.joinable = False
-                session.save()
+                session.save(update_fields=["joinable"])
 
             return redirect(urls.reverse("testsolve_one", args=[id]))
         else:
@@ -3126,9 +3143,13 @@ def rounds(request: AuthenticatedHttpRequest, id: int | None = None) -> HttpResp
     round_objs = Round.objects.all()
     if id:
         round_objs = round_objs.filter(pk=id)
-    round_objs = round_objs.prefetch_related("answers", "editors").order_by(
-        Lower("name")
-    )
+    # Prefetch the puzzles' tags too, since html_display shows the important
+    # ones for every puzzle on the page
+    round_objs = round_objs.prefetch_related(
+        Prefetch("answers", queryset=PuzzleAnswer.objects.order_by(Lower("answer"))),
+        "answers__puzzles__tags",
+        "editors",
+    ).order_by(Lower("name"))
 
     rounds = [
         {
@@ -3136,12 +3157,7 @@ def rounds(request: AuthenticatedHttpRequest, id: int | None = None) -> HttpResp
             "name": round.name,
             "description": round.description,
             "spoiled": round.spoiled.filter(id=user.id).exists(),
-            "answers": [
-                answer.to_json()
-                for answer in round.answers.all()
-                .order_by(Lower("answer"))
-                .prefetch_related("puzzles")
-            ],
+            "answers": [answer.to_json() for answer in round.answers.all()],
             "form": AnswerForm(round),
             "editors": round.editors.all().order_by(Lower("display_name")),
         }